@@ -13,6 +13,7 @@ Description:
 #!/usr/bin/env python3
 
 import ast
+import hashlib
 import heapq
 import json
 import math
@@ -37,6 +38,150 @@ search_index = defaultdict(list)
 helper_path = 'helper_indexes'
 main_path = 'main_indexes'
 
+# Global variables to track the build generation and the spills completed for it
+manifest = {}
+manifest_file = f'{helper_path}/build_manifest.json'
+spill_start = [0, 1]
+
+def file_checksum(file_name):
+    """
+    The file_checksum function computes the SHA-256 checksum of a file on disk
+    
+    Args:
+        file_name (str): A string representing the path of the file
+    
+    Returns:
+        A string containing the hexadecimal checksum of the file
+    """
+    sha = hashlib.sha256()
+    with open(file_name, mode='rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            sha.update(block)
+    
+    return sha.hexdigest()
+
+def write_durable(file_name, lines):
+    """
+    The write_durable function writes lines to a temporary file, flushes it to disk, and then
+    renames it into place so that a crash never leaves a half-written file behind
+    
+    Note:
+        The directory is also flushed to disk after the rename so that the new file name survives
+        a power loss. This step is skipped on Windows where directories cannot be opened
+    
+    Args:
+        file_name (str): A string representing the path of the file to be created
+        lines (iterable): An iterable of strings to be written to the file
+    """
+    temp_file = f'{file_name}.tmp'
+    with open(temp_file, mode='w+') as file:
+        for line in lines:
+            file.write(line)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_file, file_name)
+    
+    # Flushes directory entry for renamed file to disk
+    if os.name != 'nt':
+        directory = os.open(os.path.dirname(file_name) or '.', os.O_RDONLY)
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+def save_manifest():
+    """
+    The save_manifest function writes the manifest of the current build generation to disk
+    """
+    os.makedirs(helper_path, exist_ok=True)
+    write_durable(manifest_file, [json.dumps(manifest, indent=4)])
+
+def valid_spill(spill):
+    """
+    The valid_spill function checks that the partial indexes recorded for a spill are still
+    present on disk and unchanged since they were written
+    
+    Args:
+        spill (dict): A dictionary containing the details of a spill from the manifest
+    
+    Returns:
+        A boolean indicating if the spill can be reused
+    """
+    for (file_name, checksum) in [(spill['doc_index'], spill['doc_checksum']),
+                                  (spill['search_index'], spill['search_checksum'])]:
+        if not os.path.isfile(file_name) or file_checksum(file_name) != checksum:
+            return False
+    
+    return True
+
+def load_manifest(file_name):
+    """
+    The load_manifest function resumes the build generation recorded on disk if it was left
+    unfinished for the same zip file, otherwise a new build generation is started
+    
+    Args:
+        file_name (str): A string representing the name of the zip file
+    
+    Returns:
+        An integer containing the position of the next zip member to be indexed
+    """
+    global doc_id
+    global manifest
+    
+    # Notes details of zip file so that a checkpoint is not reused with a different corpus
+    zip_stat = os.stat(file_name)
+    zip_details = [file_name, zip_stat.st_size, zip_stat.st_mtime]
+    
+    # Reads manifest from previous run if present
+    previous = {}
+    if os.path.isfile(manifest_file):
+        with open(manifest_file) as file:
+            try:
+                previous = json.load(file)
+            except ValueError:
+                previous = {}
+    
+    # Starts a new build generation if previous run finished or used a different zip file
+    if previous.get('complete', True) or previous.get('zip_file') != zip_details:
+        manifest = {
+            'generation': str(time()).replace('.', '-'),
+            'zip_file': zip_details,
+            'complete': False,
+            'spills': []
+        }
+        save_manifest()
+        doc_id = 0
+        return 0
+    
+    # Keeps only the spills that are still intact, stopping at the first that is not
+    spills = []
+    for spill in previous['spills']:
+        if not valid_spill(spill):
+            break
+        spills.append(spill)
+    previous['spills'] = spills
+    manifest = previous
+    save_manifest()
+    
+    # Resumes after the last durable checkpoint
+    if not spills:
+        doc_id = 0
+        return 0
+    doc_id = spills[-1]['last_doc']
+    return spills[-1]['last_member'] + 1
+
+def remove_partials():
+    """
+    The remove_partials function deletes the partial indexes left on disk once a build is
+    complete, as the next run always starts a new build generation and never reads them again
+    """
+    for (directory, suffix) in [(helper_path, '_doc_index.txt'), (main_path, '_search_index.txt')]:
+        for partial_file in os.listdir(directory):
+            if partial_file.startswith('final_'):
+                continue
+            if partial_file.endswith((suffix, f'{suffix}.tmp')):
+                os.remove(f'{directory}/{partial_file}')
+
 def weighted_frequencies(element):
     """
     The weighted_frequencies function determines the term frequencies in their weighted
@@ -103,48 +248,75 @@ def extract_contents(page):
         score = 2 + math.log10(freqs[word])
         search_index[word].append((doc_id, score))
 
-def indexes_to_disk():
+def indexes_to_disk(last_member):
     """
     The indexes_to_disk function writes the indexes we have for words and documents to disk in
-    order to clear up memory usage
+    order to clear up memory usage, and records the spill in the manifest as a checkpoint
+    
+    Args:
+        last_member (int): An integer containing the position of the last zip member covered
     """
     global doc_index
     global search_index
+    global spill_start
+    
+    # Checks that there is something new to write since the last spill
+    if not doc_index:
+        return
     
-    # Note files to be created
-    current_time = time()
-    doc_index_file = f'{helper_path}/{current_time}_doc_index.txt'
-    search_index_file = f'{main_path}/{current_time}_search_index.txt'
+    # Note files to be created for current build generation
+    spill_number = len(manifest['spills'])
+    prefix = f'{manifest["generation"]}_{spill_number}'
+    doc_index_file = f'{helper_path}/{prefix}_doc_index.txt'
+    search_index_file = f'{main_path}/{prefix}_search_index.txt'
     
     # Create directories for files if not present already
     os.makedirs(helper_path, exist_ok=True)
     os.makedirs(main_path, exist_ok=True)
     
     # Creates partial indexes and adds contents
-    with open(doc_index_file, mode='w+') as doc_file:
-        for (k, v) in doc_index.items():
-            doc_file.write(f'{str([k, v])}\n')
-    with open(search_index_file, mode='w+') as search_file:
-        for (k, v) in sorted(search_index.items()):
-            search_file.write(f'{str([k, v])}\n')
+    write_durable(doc_index_file, (f'{str([k, v])}\n' for (k, v) in doc_index.items()))
+    write_durable(search_index_file, (f'{str([k, v])}\n' for (k, v) in sorted(search_index.items())))
+    
+    # Records the completed spill so that a restarted run can resume after it
+    manifest['spills'].append({
+        'first_member': spill_start[0],
+        'last_member': last_member,
+        'first_doc': spill_start[1],
+        'last_doc': doc_id,
+        'doc_index': doc_index_file,
+        'doc_checksum': file_checksum(doc_index_file),
+        'search_index': search_index_file,
+        'search_checksum': file_checksum(search_index_file)
+    })
+    save_manifest()
     
     # Resets global variables for later usage
     doc_index.clear()
     search_index.clear()
+    spill_start = [last_member + 1, doc_id + 1]
 
 def traverse_zip_file(file_name):
     """
-    The traverse_zip_file function reviews and extracts the files found within the zip file
+    The traverse_zip_file function reviews and extracts the files found within the zip file,
+    skipping the files already covered by a checkpoint from an earlier run
     
     Args:
         file_name (str): A string representing the name of the zip file
     """
     global doc_id
     global doc_index
+    global spill_start
+    
+    # Determines where to resume from based on manifest of current build generation
+    start_member = load_manifest(file_name)
+    spill_start = [start_member, doc_id + 1]
     
     # Opens zip file and traverses through files within it
     with ZipFile(file_name) as myzip:
-        for file in myzip.namelist():
+        members = myzip.namelist()
+        for member in range(start_member, len(members)):
+            file = members[member]
             
             # Checks that file being viewed is json file
             if not file.lower().endswith('.json'):
@@ -163,10 +335,10 @@ def traverse_zip_file(file_name):
             
             # Writes indexes to disk after certain number of documents
             if doc_id % 5000 == 0:
-                indexes_to_disk()
-    
-    # Creates new partial index based on current indexes still in memory
-    indexes_to_disk()
+                indexes_to_disk(member)
+        
+        # Creates new partial index based on current indexes still in memory
+        indexes_to_disk(len(members) - 1)
 
 def finalize_doc_index():
     """
@@ -175,15 +347,13 @@ def finalize_doc_index():
     """
     global doc_index
     
-    # Notes file to be created and list of partial indexes
+    # Notes file to be created and list of partial indexes from current build generation
     doc_index_file = f'{helper_path}/final_doc_index.txt'
-    doc_partial_indexes = os.listdir(helper_path)
+    doc_partial_indexes = [spill['doc_index'] for spill in manifest['spills']]
     
-    # Reads through each '_doc_index.txt' partial file and adds it to dictionary in memory
+    # Reads through each partial file and adds it to dictionary in memory
     for partial_file in doc_partial_indexes:
-        if not partial_file.endswith('_doc_index.txt'):
-            continue
-        with open(f'{helper_path}/{partial_file}') as file:
+        with open(partial_file) as file:
             for line in file:
                 doc = ast.literal_eval(line.strip())
                 doc_index[doc[0]] = doc[1]
@@ -237,25 +407,61 @@ def next_word(indexes):
         
         yield info
 
+def write_doc_blocks(postings, postings_file, location):
+    """
+    The write_doc_blocks function writes the document IDs of a posting list to disk in blocks
+    so that searches can seek to the blocks they need instead of reading the full list
+    
+    Note:
+        Blocks hold the square root of the posting list length in document IDs. The first
+        document ID and location of each block act as skip pointers when intersecting lists
+    
+    Args:
+        postings (list): A list of tuples containing the document ID and tf score
+        postings_file (object): A file object representing our final postings index
+        location (int): An integer containing the current location within the postings index
+    
+    Returns:
+        A tuple containing a list of the first document ID and location of each block, and the
+        location within the postings index after the blocks written
+    """
+    docs = sorted(doc for (doc, score) in postings)
+    step = max(int(math.sqrt(len(docs))), 1)
+    
+    blocks = []
+    for i in range(0, len(docs), step):
+        block = f'{str(docs[i:i + step])}\n'
+        postings_file.write(block)
+        blocks.append((docs[i], location))
+        location += len(block)
+    
+    return (blocks, location)
+
 def finalize_search_index():
     """
     The finalize_search_index function combines the partial indexes from disk to produce
     our final index for search functionality and word location
+    
+    Note:
+        Each word in the search index holds its top docs by tf score for ranking, its idf score,
+        its document frequency, and the blocks of its full document list in the postings index
     """    
-    # Note files to be created and list of partial indexes
+    # Note files to be created and list of partial indexes from current build generation
     word_index_file = f'{helper_path}/final_word_index.txt'
     search_index_file = f'{main_path}/final_search_index.txt'
-    search_partial_indexes = os.listdir(main_path)
+    postings_index_file = f'{main_path}/final_postings_index.txt'
+    search_partial_indexes = [spill['search_index'] for spill in manifest['spills']]
     
-    # Create dictionary and tracker to house word locations within final index
+    # Create dictionary and trackers to house word locations within final indexes
     word_index = {}
     word_location = 0
+    postings_location = 0
     
     # Creates context managers for all files needing to be reviewed
-    with open(search_index_file, mode='w+') as search_file:
+    with open(search_index_file, mode='w+') as search_file, \
+         open(postings_index_file, mode='w+') as postings_file:
         with ExitStack() as stack:
-            files = [stack.enter_context(open(f'{main_path}/{partial_file}')) for partial_file
-                     in search_partial_indexes if partial_file.endswith('_search_index.txt')]
+            files = [stack.enter_context(open(partial_file)) for partial_file in search_partial_indexes]
             
             # Variable to keep track of results returned from next_word function
             prev_result = ['', []]
@@ -272,12 +478,17 @@ def finalize_search_index():
                     word_index[prev_result[0]] = word_location
                     
                     # Compute tf score for term in relation to corpus
+                    # Full document list is written to postings index in blocks
                     doc_freqs = len(prev_result[1])
                     if doc_freqs > 0:
                         prev_result.append(math.log10(doc_id / doc_freqs))
+                        prev_result.append(doc_freqs)
+                        blocks, postings_location = write_doc_blocks(prev_result[1], postings_file,
+                                                                     postings_location)
+                        prev_result.append(blocks)
 
                     # Writes result to search index and updates location for next word
-                    # Only the top docs with highests tf scores are used
+                    # Only the top docs with highests tf scores are used for ranking
                     prev_result[1] = Counter(dict(prev_result[1])).most_common(250)
                     entry = f'{str(prev_result)}\n'
                     search_file.write(entry)
@@ -291,6 +502,9 @@ def finalize_search_index():
             doc_freqs = len(prev_result[1])
             if doc_freqs > 0:
                 prev_result.append(math.log10(doc_id / doc_freqs))
+                prev_result.append(doc_freqs)
+                blocks, postings_location = write_doc_blocks(prev_result[1], postings_file, postings_location)
+                prev_result.append(blocks)
             prev_result[1] = Counter(dict(prev_result[1])).most_common(250)
             entry = f'{str(prev_result)}\n'
             search_file.write(entry)
@@ -315,12 +529,19 @@ def main():
         sys.exit("Zip file containing web pages was not found\n"
                  "Please ensure that 'developer.zip' is placed within the same directory")
     
-    # Traverses through zip file
+    # Traverses through zip file, resuming from last checkpoint if a previous run was interrupted
     traverse_zip_file(zip_file)
     
     # Finalizes partial indexes created
     finalize_doc_index()
     finalize_search_index()
+    
+    # Marks build generation as complete so that the next run starts a fresh build
+    manifest['complete'] = True
+    save_manifest()
+    
+    # Removes partial indexes no longer needed now that final indexes are built
+    remove_partials()
 
 if __name__ == "__main__":
     main()
@@ -14,6 +14,7 @@ import math
 import re
 import sys
 
+from bisect import bisect_right
 from collections import Counter
 from numpy import dot
 from os import path
@@ -42,7 +43,8 @@ def init():
     index_files = [
         'helper_indexes/final_doc_index.txt',
         'helper_indexes/final_word_index.txt',
-        'main_indexes/final_search_index.txt'
+        'main_indexes/final_search_index.txt',
+        'main_indexes/final_postings_index.txt'
     ]
     
     # Checks if all indexes are present
@@ -103,39 +105,229 @@ def cosine_similarity(tf, idf):
     
     return scores.most_common(50)
 
-def pull_documents(key_words):
+def read_block(postings_file, location):
     """
-    The pull_documents function seraches for documents in our indexes that best fit the key words
-    provided by the user
+    The read_block function reads one block of document IDs from our postings index
+    
+    Args:
+        postings_file (object): A file object representing our postings index
+        location (int): An integer containing the location of the block within the postings index
+    
+    Returns:
+        A list of document IDs sorted in ascending order
+    """
+    postings_file.seek(location)
+    
+    return ast.literal_eval(postings_file.readline().strip())
+
+def read_docs(entry, postings_file):
+    """
+    The read_docs function reads every block of document IDs for a word from our postings index
+    
+    Args:
+        entry (dict): A dictionary containing the index details of the word
+        postings_file (object): A file object representing our postings index
+    
+    Returns:
+        A list of all document IDs containing the word sorted in ascending order
+    """
+    # Blocks of a word are stored one after the other so they are read in order
+    postings_file.seek(entry['blocks'][0][1])
+    docs = []
+    for _ in entry['blocks']:
+        docs.extend(ast.literal_eval(postings_file.readline().strip()))
+    
+    return docs
+
+def intersect_blocks(docs, entry, postings_file):
+    """
+    The intersect_blocks function finds the documents given that also contain a word, using the
+    first document ID of each block as skip pointers so that only the blocks needed are read
+    
+    Args:
+        docs (list): A list of document IDs sorted in ascending order
+        entry (dict): A dictionary containing the index details of the word
+        postings_file (object): A file object representing our postings index
+    
+    Returns:
+        A list of document IDs found in both lists sorted in ascending order
+    """
+    firsts = [first for (first, location) in entry['blocks']]
+    
+    results = []
+    current = -1
+    block = []
+    i = 0
+    for doc in docs:
+        
+        # Skips to the block that would hold the document, reading it if not already read
+        position = bisect_right(firsts, doc) - 1
+        if position < 0:
+            continue
+        if position != current:
+            current = position
+            block = read_block(postings_file, entry['blocks'][position][1])
+            i = 0
+        
+        # Moves through block until document is reached or passed
+        while i < len(block) and block[i] < doc:
+            i += 1
+        if i < len(block) and block[i] == doc:
+            results.append(doc)
+    
+    return results
+
+def match_docs(docs, clauses, required, excluded, postings, postings_file):
+    """
+    The match_docs function filters the documents given down to those that satisfy the boolean
+    query provided by the user
+    
+    Note:
+        Documents must match at least one clause, where every word of a clause must be present.
+        Documents must also contain every required word and none of the excluded words
+    
+    Args:
+        docs (list): A list of document IDs sorted in ascending order
+        clauses (list): A list of lists containing the words of each clause
+        required (list): A list of strings containing the words that must be present
+        excluded (list): A list of strings containing the words that must not be present
+        postings (dict): A dictionary mapping words to their index details
+        postings_file (object): A file object representing our postings index
+    
+    Returns:
+        A list of document IDs matching the query sorted in ascending order
+    """
+    # Notes which of the documents contain each word of the query
+    present = {}
+    for word in {word for clause in clauses for word in clause} | set(required) | set(excluded):
+        if word in postings:
+            present[word] = set(intersect_blocks(docs, postings[word], postings_file))
+        else:
+            present[word] = set()
+    
+    results = []
+    for doc in docs:
+        if clauses and not any(all(doc in present[word] for word in clause) for clause in clauses):
+            continue
+        if not all(doc in present[word] for word in required):
+            continue
+        if any(doc in present[word] for word in excluded):
+            continue
+        results.append(doc)
+    
+    return results
+
+def fill_documents(clauses, required, excluded, postings, postings_file):
+    """
+    The fill_documents function finds every document matching the boolean query by reading the
+    full document list of the rarest word in each clause and checking it against the other words
+    
+    Args:
+        clauses (list): A list of lists containing the words of each clause
+        required (list): A list of strings containing the words that must be present
+        excluded (list): A list of strings containing the words that must not be present
+        postings (dict): A dictionary mapping words to their index details
+        postings_file (object): A file object representing our postings index
+    
+    Returns:
+        A list of document IDs matching the query sorted in ascending order
+    """
+    # Every matching document must contain the rarest word of a clause, or of the required words
+    groups = clauses if clauses else [required]
+    docs = set()
+    for group in groups:
+        if group and all(word in postings for word in group):
+            rarest = min(group, key=lambda word: postings[word]['count'])
+            docs.update(read_docs(postings[rarest], postings_file))
+    
+    return match_docs(sorted(docs), clauses, required, excluded, postings, postings_file)
+
+def read_postings(key_words):
+    """
+    The read_postings function pulls the index details of the key words from our inverted index
     
     Args:
         key_words (list): A list of strings containing the words needing to be referenced
     
     Raises:
         SystemExit: If value pulled from inverted index does not match key word it relates to
+        SystemExit: If value pulled from inverted index does not contain document blocks
     
     Returns:
-        A list of document IDs matching the key words given
+        A dictionary mapping each key word found in the index to its top tf scores, idf score,
+        document frequency, and document blocks
     """
-    # Grab positions of words in relation to inverted index and length of key words given
-    positions = [vocab_index[word] for word in key_words]
-    num_words = len(key_words)
+    # Grab positions of words in relation to inverted index, ignoring words not in the corpus
+    positions = sorted((vocab_index[word], word) for word in key_words if word in vocab_index)
     
-    # Creates list to store inverted index values and read through index
-    curr_tf = []
-    curr_idf = []
+    # Creates dictionary to store inverted index values and read through index
+    postings = {}
     with open('main_indexes/final_search_index.txt') as index_file:
-        for i in range(num_words):
-            index_file.seek(positions[i])
+        for (position, word) in positions:
+            index_file.seek(position)
             result = ast.literal_eval(index_file.readline().strip())
             
             # Checks that key word matches inverted index value found
-            if key_words[i] != result[0]:
+            if word != result[0]:
                 sys.exit("Incorrect match with query words in relation to index\n"
                          "Please rebuild index through 'indexer.py'")
+            
+            # Checks that index value found was built with document blocks
+            elif len(result) < 5:
+                sys.exit("Index is missing document blocks for query words\n"
+                         "Please rebuild index through 'indexer.py'")
             else:
-                curr_tf.append(dict(result[1]))
-                curr_idf.append(result[2])
+                postings[word] = {
+                    'tf': dict(result[1]),
+                    'idf': result[2],
+                    'count': result[3],
+                    'blocks': result[4]
+                }
+    
+    return postings
+
+def pull_documents(clauses, required, excluded):
+    """
+    The pull_documents function seraches for documents in our indexes that best fit the boolean
+    query provided by the user
+    
+    Note:
+        Documents are ranked from the top docs by tf score stored for each word. Queries using
+        AND, NOT, or quoted terms check those docs against the full document lists, and only
+        read the full lists of the rarest words if too few of those docs match
+    
+    Args:
+        clauses (list): A list of lists containing the words of each clause
+        required (list): A list of strings containing the words that must be present
+        excluded (list): A list of strings containing the words that must not be present
+    
+    Returns:
+        A list of document IDs matching the query given
+    """
+    # Grab index details of all words given
+    key_words = list({word for clause in clauses for word in clause} | set(required))
+    postings = read_postings(key_words + list(excluded))
+    
+    # Checks if query uses boolean operators beyond matching any of the words
+    boolean = required or excluded or any(len(clause) > 1 for clause in clauses)
+    
+    # Notes the documents with top tf scores for the words as candidates for ranking
+    candidates = sorted({doc for word in key_words if word in postings for doc in postings[word]['tf']})
+    
+    # Restricts candidates to those matching the boolean query
+    if boolean:
+        with open('main_indexes/final_postings_index.txt') as postings_file:
+            candidates = match_docs(candidates, clauses, required, excluded, postings, postings_file)
+    candidates = set(candidates)
+    
+    # Only the documents matching the query are scored
+    curr_tf = []
+    curr_idf = []
+    for word in key_words:
+        if word in postings:
+            curr_tf.append({doc: score for (doc, score) in postings[word]['tf'].items() if doc in candidates})
+            curr_idf.append(postings[word]['idf'])
+    num_words = len(curr_idf)
     
     # Variable to note threshold of terms that appear in 90% of corpus
     threshold = math.log10(10 / 9)
@@ -159,32 +351,88 @@ def pull_documents(key_words):
     curr_idf.clear()
     
     # Computes cosine similarity values for each document
-    results = cosine_similarity(new_tf, new_idf)
+    results = [doc[0] for doc in cosine_similarity(new_tf, new_idf)]
     
-    return [doc[0] for doc in results]
+    # Fills remaining results with matching documents outside of the top docs
+    if boolean and len(results) < 50:
+        ranked = set(results)
+        with open('main_indexes/final_postings_index.txt') as postings_file:
+            results.extend(doc for doc in fill_documents(clauses, required, excluded, postings, postings_file)
+                           if doc not in ranked)
+    
+    return results[:50]
+
+def parse_query(query):
+    """
+    The parse_query function splits the query entered by a user into its boolean parts
+    
+    Note:
+        Terms are joined by OR unless AND is placed between them. Terms following NOT are
+        excluded from every result and terms in quotes are required in every result
+    
+    Args:
+        query (str): A string containing the query terms entered by the user
+    
+    Returns:
+        A tuple containing the list of clauses, the required words, and the excluded words
+    """
+    pattern = re.compile("[a-zA-Z0-9@#*&']{2,}")
+    ps = PorterStemmer()
+    
+    clauses = []
+    required = set()
+    excluded = set()
+    join_and = False
+    negate = False
+    
+    # Reviews each quoted phrase or space separated token in order
+    for token in re.findall('"[^"]*"?|[^\\s"]+', query):
+        if token in {'AND', 'OR', 'NOT'}:
+            join_and = token == 'AND'
+            negate = negate or token == 'NOT'
+            continue
+        
+        # Produces stemmed list of words in token
+        words = [ps.stem(word.lower()) for word in pattern.findall(token)]
+        if not words:
+            continue
+        
+        # Adds words to the part of the query they belong to
+        if negate:
+            excluded.update(words)
+        elif token.startswith('"'):
+            required.update(words)
+        else:
+            for word in words:
+                if join_and and clauses:
+                    if word not in clauses[-1]:
+                        clauses[-1].append(word)
+                else:
+                    clauses.append([word])
+        join_and = False
+        negate = False
+    
+    return (clauses, sorted(required), sorted(excluded))
 
 def perform_search(query):
     """
     The perform_serach function takes the query entered by a user and presents the list of documents
     that best match the search words entered sorted by their rank results
     
+    Note:
+        The query supports the AND, OR, and NOT operators along with quoted required terms
+    
     Args:
         query (str): A string containing the query terms entered by the user
     
     Returs:
         A list containing document information based on search done
     """    
-    # Finds list of words in input
-    pattern = re.compile("[a-zA-Z0-9@#*&']{2,}")
-    word_list = pattern.findall(query)
-
-    # Produces stemmed list of words and removes duplicates
-    ps = PorterStemmer()
-    stem_word_list = [ps.stem(word.lower()) for word in word_list]
-    stem_word_list = list(set(stem_word_list))
+    # Splits query into its boolean parts with stemmed words
+    clauses, required, excluded = parse_query(query)
 
     # Pulls documents found from query and prints the results
-    docs = pull_documents(stem_word_list)
+    docs = pull_documents(clauses, required, excluded)
     docs_info = [doc_index[str(id)] for id in docs]
     
     return docs_info